@@ -0,0 +1,176 @@
+import asyncio
+from typing import Union, Tuple
+
+import serial_asyncio
+
+from .lvp import (
+    ACK_MSG,
+    BaseLVP,
+    Value,
+    _bind_function,
+    _check_set_response,
+    _get_names,
+    _parse_get_response,
+    _parse_spec,
+    _set_values,
+    default_device,
+)
+
+
+class AsyncLVP(BaseLVP):
+    """
+    Asyncio version of LVP.
+
+    All communication methods are coroutines, so a single event loop can talk
+    to many arduinos without a thread per device. Requires the
+    pyserial-asyncio package.
+
+    Unlike LVP, quiet mode is not supported and get()/set() with several
+    variables are not batched: each variable takes its own round-trip.
+    """
+
+    def __init__(
+        self,
+        device=None,
+        baud=9600,
+        log=None,
+        echo=False,
+        functions=(),
+        cooldown=2.0,
+        id=None,
+        log_path=None,
+        log_id=False,
+        log_path_with_id=False,
+    ):
+        self._id = id
+        self._init = False
+        self._lock = asyncio.Lock()
+        self._init_log(log, echo, log_path, log_id, log_path_with_id)
+
+        # The serial connection can only be opened from a running event loop,
+        # hence it is created by init(). The cooldown period starts then.
+        self.device = device or default_device()
+        self._baud = baud
+        self._cooldown = cooldown
+        self._reader = None
+        self._writer = None
+
+        for spec in functions:
+            self.declare(spec)
+
+    async def init(self, force=False):
+        """
+        Open connection and start the manual_connect mode.
+        """
+        async with self._lock:
+            if self._init and not force:
+                return
+
+            if self._reader is None:
+                open_connection = serial_asyncio.open_serial_connection
+                self._reader, self._writer = await open_connection(
+                    url=self.device, baudrate=self._baud
+                )
+                await asyncio.sleep(self._cooldown)
+
+            boot = await self._flush(1 / 16)
+            self._writer.write(b"manual_connect\n")
+            ack = await self._reader.readuntil(ACK_MSG)
+        self.log(boot)
+        self.log(b">>> manual_connect\n")
+        self.log(ack)
+        self._init = True
+
+    async def close(self):
+        """
+        Close the serial connection and the log file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+        self._reader = self._writer = None
+        self._close_log()
+        self._init = False
+
+    async def send(self, msg: Union[str, bytes], timeout=None) -> str:
+        """
+        Send message to arduino and return the response.
+        """
+        if isinstance(msg, str):
+            msg = msg.encode("ascii")
+        if not msg.endswith(b"\n"):
+            msg += b"\n"
+
+        out = await self._request(msg, timeout)
+        return out.translate(None, b"\r").decode("ascii")
+
+    async def _request(self, msg: bytes, timeout=None) -> bytes:
+        if not self._init:
+            await self.init()
+        self.log(b">>> " + msg)
+        async with self._lock:
+            self._writer.write(msg)
+            out = await asyncio.wait_for(self._reader.readuntil(b"\r\n"), timeout)
+            out += await self._flush()
+        self.log(out)
+        return out
+
+    async def _flush(self, timeout=1 / 64) -> bytes:
+        """
+        Read lines until the device stays silent for timeout seconds.
+        """
+        out = bytearray()
+        while True:
+            try:
+                msg = await asyncio.wait_for(self._reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if not msg:
+                break
+            out.extend(msg)
+        return bytes(out)
+
+    async def get(self, *args) -> Union[Value, Tuple[Value, ...]]:
+        """
+        Get value assigned to variable.
+        """
+        names = _get_names(args)
+        if isinstance(names, str):
+            return await self._get(names)
+        return tuple([await self._get(name) for name in names])
+
+    async def _get(self, name):
+        out = await self._request(f"get({name})\n".encode("ascii"))
+        return _parse_get_response(name, out)
+
+    async def set(self, *args, **kwargs) -> None:
+        """
+        Set value assigned to variable.
+        """
+        for k, v in _set_values(args, kwargs).items():
+            await self._set(k, v)
+
+    async def _set(self, name: str, value: Value):
+        out = await self._request(f"set({name},{value})\n".encode("ascii"))
+        _check_set_response(name, out)
+
+    async def exec(self, cmd) -> str:
+        """
+        Executes command and returns the resulting messages
+        """
+        return await self.send(cmd)
+
+    def declare(self, spec, bind=True):
+        """
+        Declare a LVP function from specification.
+
+        The resulting function is a coroutine function.
+        """
+        name, argnames = _parse_spec(spec)
+
+        async def func(*args):
+            for k, v in zip(argnames, args):
+                await self._set(k, v)
+            return await self.exec(name)
+
+        return _bind_function(self, name, spec, func, bind)
@@ -0,0 +1,66 @@
+import asyncio
+
+from .async_lvp import AsyncLVP
+from .lvp import _bind_function, _parse_spec
+from .lvp_pool import BaseLVPPool
+
+
+class AsyncLVPPool(BaseLVPPool):
+    """
+    Communicates with more than one arduino simultaneously from a single
+    event loop.
+
+    Asyncio version of LVPPool: all communication methods are coroutines.
+    """
+
+    device_class = AsyncLVP
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _gather(self, func, devices=None, timeout=None):
+        devices = self if devices is None else list(devices)
+        coros = [asyncio.wait_for(func(dev), timeout) for dev in devices]
+        results = await asyncio.gather(*coros)
+        return {dev.id: res for dev, res in zip(devices, results)}
+
+    async def close(self):
+        """
+        Close connections with all devices.
+        """
+        await asyncio.gather(*(dev.close() for dev in self))
+
+    async def get(self, ref, *args, timeout=None):
+        """
+        Get set of values from all selected devices.
+        """
+        devs = self.query(ref)
+        return await self._gather(lambda d: d.get(*args), devs, timeout)
+
+    async def set(self, ref, *args, timeout=None, **kwargs):
+        """
+        Set of values on all selected all devices.
+        """
+        devs = self.query(ref)
+        await self._gather(lambda d: d.set(*args, **kwargs), devs, timeout)
+
+    def declare(self, spec, bind=True):
+        """
+        Declare function.
+        """
+        name, _ = _parse_spec(spec)
+        funcs = {dev.id: dev.declare(spec, bind=False) for dev in self}
+
+        async def func(query, *args):
+            def target(dev):
+                return funcs[dev.id](*args)
+
+            return await self._gather(target, self.query(query))
+
+        return _bind_function(self, name, spec, func, bind)
+
+    async def exec(self, query, cmd):
+        return await self._gather(lambda d: d.exec(cmd), self.query(query))
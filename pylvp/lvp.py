@@ -1,26 +1,100 @@
 import time
 from collections import deque
+from functools import lru_cache
 import re
-from contextlib import contextmanager
-from datetime import datetime
+import sys
+from contextlib import contextmanager, nullcontext
 import serial
 from serial.tools.list_ports import comports
-from typing import Union, Tuple, Callable
-from threading import Thread, Lock
+from typing import Union, Tuple, Callable, List
+from threading import Event, Thread, Lock
 
 FUNC_SPEC_RE = re.compile(r"(?P<name>[\w_]+)\((?P<args>[^()]*)\)")
 GET_RESP_RE = re.compile(r"Parameter\s+'(?P<name>[\w_]+)':\s+(?P<value>[^\n\r]+)")
 SET_RESP_RE = re.compile(
     r"Parameter\s+'(?P<name>[\w_]+)'\s+set to\s+'(?P<value>[^\n\r']+)'"
 )
+INT_RE = re.compile(r"[-+]?\d+")
+FLOAT_RE = re.compile(
+    r"[-+]?((\d+\.?\d*|\.\d+)([eE][-+]?\d+)?|inf|nan)", re.IGNORECASE
+)
+LINE_START_RE = re.compile(rb"^(?!\Z)", re.MULTILINE)
 ACK_MSG = b"Manual connection established.\n\r\n"
+MAX_LOG_LEN = 512  # maximum size of each message kept in LVP._messages
+PORT_CACHE_TTL = 5.0  # seconds
+BATCH_TIMEOUT = 1 / 4  # seconds to wait for each response after the first
 Value = Union[str, float, int]
 
 
-class LVP:
+@lru_cache(maxsize=128)
+def _parse_spec(spec: str) -> Tuple[str, Tuple[str, ...]]:
     """
-    Represents a connection with an arduino running the LVP communication
-    protocol.
+    Parse function specification into a (name, argnames) tuple.
+    """
+    m = FUNC_SPEC_RE.fullmatch(spec)
+    if not m:
+        raise ValueError(f"invalid specification: {spec!r}")
+    data = m.groupdict()
+    argnames = tuple(arg.strip() for arg in data["args"].split(","))
+    return data["name"], argnames
+
+
+def _bind_function(owner, name, spec, func, bind):
+    """
+    Finish declaring func from spec, optionally binding it to owner as name.
+    """
+    func.__name__ = name
+    func.__doc__ = f"Calls the {spec} lvp function"
+    if bind:
+        setattr(owner, name, func)
+    return func
+
+
+def _get_names(args) -> Union[str, Tuple[str, ...]]:
+    """
+    Normalize the arguments of get() into a single name or a tuple of names.
+    """
+    if len(args) == 1:
+        if isinstance(args[0], str):
+            return args[0]
+        else:
+            args = args[0]
+    return tuple(args)
+
+
+def _set_values(args, kwargs) -> dict:
+    """
+    Normalize the arguments of set() into a dictionary of values.
+    """
+    if len(args) == 1:
+        kwargs = {**args[0], **kwargs}
+    elif len(args) == 2:
+        key, value = args
+        kwargs[key] = value
+    elif len(args) > 2:
+        raise TypeError("function accepts at most 2 positional arguments")
+    return kwargs
+
+
+@lru_cache(maxsize=256)
+def _get_re_for(name: str):
+    """
+    Regex that matches the response of get() for the given variable name.
+    """
+    return re.compile(rf"Parameter\s+'{re.escape(name)}':\s+([^\n\r]+)")
+
+
+@lru_cache(maxsize=256)
+def _set_re_for(name: str):
+    """
+    Regex that matches the response of set() for the given variable name.
+    """
+    return re.compile(rf"Parameter\s+'{re.escape(name)}'\s+set to\s+'([^\n\r']+)'")
+
+
+class BaseLVP:
+    """
+    Functionality shared by LVP and AsyncLVP that does not perform I/O.
     """
 
     @property
@@ -29,6 +103,43 @@ class LVP:
             return self.device.split("/")[-1]
         return self._id
 
+    def _init_log(self, log, echo, log_path, log_id, log_path_with_id):
+        # Logger is a function that receives messages and do something with
+        # them
+        self._messages = deque([], 64)
+        self._log = log or default_logger(
+            self, path=log_path, prepend_id=log_id, path_with_id=log_path_with_id
+        )
+        if echo:
+            self._log = echo_logger(self._log)
+
+    def __getattr__(self, attr) -> Callable:
+        # Only reached on lookup failures: declared functions are stored in
+        # the instance __dict__ and found by the regular attribute lookup.
+        # This method exists to tell type checkers that arbitrary attributes
+        # may be declared functions.
+        raise AttributeError(attr)
+
+    def __repr__(self):
+        idmsg = f"({self._id})" if self._id else ""
+        return f"<{type(self).__name__} instance at {self.device!r}{idmsg}>"
+
+    def log(self, msg):
+        self._messages.append(msg[:MAX_LOG_LEN])
+        self._log(msg)
+
+    def _close_log(self):
+        close_log = getattr(self._log, "close", None)
+        if close_log is not None:
+            close_log()
+
+
+class LVP(BaseLVP):
+    """
+    Represents a connection with an arduino running the LVP communication
+    protocol.
+    """
+
     def __init__(
         self,
         device=None,
@@ -41,21 +152,18 @@ class LVP:
         log_path=None,
         log_id=False,
         log_path_with_id=False,
+        thread_safe=True,
     ):
         self._id = id
         self._quiet = False
         self._init = False
-        self._lock = Lock()
+        self._batch_ok = True  # disabled if firmware rejects compound commands
 
-        # Logger is a function that receives messages and do something with
-        # them
-        self._messages = deque([], 64)
-        self._log = log or default_logger(
-            self, path=log_path, prepend_id=log_id, path_with_id=log_path_with_id
-        )
-        if echo:
-            log = self.log
-            self._log = lambda msg: (print(msg), log(msg))
+        # Single threaded users may opt out of locking. Background tasks run
+        # in a separate thread and are refused if thread_safe=False.
+        self.thread_safe = thread_safe
+        self._lock = Lock() if thread_safe else nullcontext()
+        self._init_log(log, echo, log_path, log_id, log_path_with_id)
 
         # Create serial connection, but do not initialize arduino. We must
         # wait the cooldown period before interacting with it to let it
@@ -68,31 +176,32 @@ class LVP:
         for spec in functions:
             self.declare(spec)
 
-    def __getattr__(self, attr) -> Callable:
-        raise AttributeError(attr)
-
-    def __repr__(self):
-        idmsg = f"({self._id})" if self._id else ""
-        return f"<LVP instance at {self.device!r}{idmsg}>"
-
-    def log(self, msg):
-        self._messages.append(msg)
-        self._log(msg)
+    def close(self):
+        """
+        Close the serial connection and the log file.
+        """
+        self._serial.close()
+        self._close_log()
+        self._init = False
 
     def init(self, force=False):
         if force or not self._init:
             time.sleep(max(0, self._connect_deadline - time.time()))
+            boot = []
             with self._lock:
                 self._serial.timeout = 1 / 16
 
                 msg = "..."
                 while msg:
                     msg = self._serial.readline()
-                    self.log(msg)
+                    boot.append(msg)
 
                 self._serial.timeout = None
                 self._send(b"manual_connect\n")
-                self.log(self._serial.read_until(ACK_MSG))
+                ack = self._serial.read_until(ACK_MSG)
+            self.log(b"".join(boot))
+            self.log(b">>> manual_connect\n")
+            self.log(ack)
             self._init = True
 
     def send(self, msg: Union[str, bytes], cycles=None, timeout=None) -> str:
@@ -104,17 +213,34 @@ class LVP:
         if not msg.endswith(b"\n"):
             msg += b"\n"
 
-        self.init()
+        return self._send_raw(msg, timeout)
+
+    def _send_raw(self, msg: bytes, timeout=None) -> str:
+        """
+        Like send(), but msg must be an already encoded and newline terminated
+        command.
+        """
+        out = self._request(msg, timeout)
+        return out.translate(None, b"\r").decode("ascii")
+
+    def _request(self, msg: bytes, timeout=None) -> bytes:
+        """
+        Send a newline terminated message and return the raw response.
+        """
+        if not self._init:
+            self.init()
+        self.log(b">>> " + msg)
         with self._lock:
             self._serial.timeout = timeout
             self._send(msg)
             out = self._recv(b"\r\n", flush=True)
         self.log(out)
-        return out.decode("ascii").replace("\r\n", "\n")
+        return out
 
     def _send(self, msg: bytes) -> None:
+        # Pure write: callers are responsible for logging, preferably outside
+        # the lock.
         self._serial.write(msg)
-        self.log(b">>> " + msg)
 
     def _recv(self, until=None, flush=False, timeout=1 / 64) -> bytes:
         if self._quiet:
@@ -128,56 +254,124 @@ class LVP:
             out = self._serial.readline()
 
         if flush:
-            msg = b"..."
-            self._serial.timeout = timeout
-            while msg:
-                msg = self._serial.readline()
-                out += msg
+            out += self._flush(timeout)
         return out
 
+    def _flush(self, timeout=1 / 64) -> bytes:
+        """
+        Read lines until the device stays silent for timeout seconds.
+        """
+        out = bytearray()
+        msg = b"..."
+        self._serial.timeout = timeout
+        while msg:
+            msg = self._serial.readline()
+            out.extend(msg)
+        return bytes(out)
+
+    def _batch(self, cmds: List[bytes], names, regex_for) -> list:
+        """
+        Send several encoded commands in a single line and return the value
+        parsed from the response to each command.
+
+        regex_for(name) must return a regex whose first group is the value.
+
+        Return None if any response is missing or malformed. This happens if
+        the firmware does not understand compound commands, but also on bad
+        requests, so it is up to the caller to decide if batching should be
+        disabled.
+        """
+        msg = b";".join(cmds) + b"\n"
+
+        if not self._init:
+            self.init()
+        self.log(b">>> " + msg)
+        lines = []
+        values = []
+        with self._lock:
+            # Only the first response may take arbitrarily long, just like in
+            # a regular request. Firmware that ignores the other commands
+            # would make us wait forever for the remaining responses.
+            self._serial.timeout = None
+            self._send(msg)
+            try:
+                for name in names:
+                    line = self._serial.read_until(b"\r\n")
+                    self._serial.timeout = BATCH_TIMEOUT
+                    lines.append(line)
+
+                    m = regex_for(name).match(line.decode("ascii", "replace"))
+                    if not (line.endswith(b"\r\n") and m):
+                        break
+                    values.append(m.group(1))
+            finally:
+                # Never leave unread responses behind for the next request
+                lines.append(self._flush())
+        self.log(b"".join(lines))
+
+        if len(values) != len(names):
+            return None
+        return values
+
     def get(self, *args) -> Union[Value, Tuple[Value, ...]]:
         """
         Get value assigned to variable.
         """
-        if len(args) == 1:
-            if isinstance(args[0], str):
-                return self._get(args[0])
-            else:
-                args = args[0]
-        return tuple(self._get(name) for name in args)
+        names = _get_names(args)
+        if isinstance(names, str):
+            return self._get(names)
+        return self._get_many(names)
 
     def _get(self, name):
-        out = self.send(f"get({name})")
-        m = GET_RESP_RE.search(out)
-
-        data = m and m.groupdict()
-        if not m or data["name"] != name:
-            raise RuntimeError(f"bad response: {out!r}")
-
-        return normalize_response(data["value"])
+        out = self._request(f"get({name})\n".encode("ascii"))
+        return _parse_get_response(name, out)
+
+    def _get_many(self, names: Tuple[str, ...]) -> Tuple[Value, ...]:
+        batch = len(names) > 1 and self._batch_ok and not self._quiet
+        if batch:
+            cmds = [f"get({name})".encode("ascii") for name in names]
+            values = self._batch(cmds, names, _get_re_for)
+            if values is not None:
+                return tuple(map(normalize_response, values))
+
+        result = tuple(self._get(name) for name in names)
+        if batch:
+            # The same requests succeed one by one: blame the firmware
+            self._batch_ok = False
+        return result
 
     def set(self, *args, **kwargs) -> None:
         """
         Set value assigned to variable.
         """
-        if len(args) == 1:
-            kwargs = {**args[0], **kwargs}
-        elif len(args) == 2:
-            key, value = args
-            kwargs[key] = value
-        elif len(args) > 2:
-            raise TypeError("function accepts at most 2 positional arguments")
-
-        for k, v in kwargs.items():
-            self._set(k, v)
+        values = _set_values(args, kwargs)
+        if len(values) > 1:
+            self._set_many(values)
+        else:
+            for k, v in values.items():
+                self._set(k, v)
 
     def _set(self, name: str, value: Value):
-        out = self.send(f"set({name},{value})")
-        m = SET_RESP_RE.search(out)
+        self._set_cmd(name, f"set({name},{value})".encode("ascii"))
 
-        data = m and m.groupdict()
-        if not m or data["name"] != name:
-            raise RuntimeError(f"bad response: {out!r}")
+    def _set_cmd(self, name: str, cmd: bytes):
+        out = self._request(cmd + b"\n")
+        _check_set_response(name, out)
+
+    def _set_many(self, values: dict):
+        cmds = [f"set({k},{v})".encode("ascii") for k, v in values.items()]
+        self._set_cmds(tuple(values), cmds)
+
+    def _set_cmds(self, names: Tuple[str, ...], cmds: List[bytes]):
+        batch = len(cmds) > 1 and self._batch_ok and not self._quiet
+        if batch and self._batch(cmds, names, _set_re_for) is not None:
+            return
+
+        for name, cmd in zip(names, cmds):
+            self._set_cmd(name, cmd)
+        if batch:
+            # The same requests succeed one by one: blame the firmware
+            self._batch_ok = False
 
     def exec(self, cmd) -> str:
         """
@@ -192,46 +386,54 @@ class LVP:
         It returns a cancellation function that can stop the background task
         when executed.
         """
+        if not self.thread_safe:
+            raise RuntimeError("background tasks require thread_safe=True")
 
         self.init()
-        keep = True
+        stop_event = Event()
 
         def task():
-            while keep:
+            while True:
                 if echo:
                     print(f"[bg] executing {command}")
                 self.exec(command)
-                time.sleep(period)
-
-        def stop():
-            nonlocal keep
-            keep = False
+                if stop_event.wait(period):
+                    break
 
         thread = Thread(target=task)
         thread.start()
-        return stop
+        return stop_event.set
 
     def declare(self, spec, bind=True):
         """
         Declare a LVP function from specification.
         """
-        m = FUNC_SPEC_RE.fullmatch(spec)
-        if not m:
-            raise ValueError(f"invalid specification: {spec!r}")
-        data = m.groupdict()
-        name = data["name"]
-        argnames = [arg.strip() for arg in data["args"].split(",")]
+        name, argnames = _parse_spec(spec)
+
+        # Commands are encoded once here rather than on each call.
+        exec_cmd = name.encode("ascii") + b"\n"
+        set_templates = tuple(b"set(" + arg.encode("ascii") + b"," for arg in argnames)
+
+        def call(args):
+            if len(args) == 1:
+                value = str(args[0]).encode("ascii")
+                self._set_cmd(argnames[0], set_templates[0] + value + b")")
+            elif args:
+                cmds = [
+                    b"".join([tmpl, str(value).encode("ascii"), b")"])
+                    for tmpl, value in zip(set_templates, args)
+                ]
+                # Slicing is a no-op when all arguments are given
+                self._set_cmds(argnames[: len(cmds)], cmds)
+            return self._send_raw(exec_cmd)
 
         def func(*args, quiet=False):
-            with self._maybe_quiet(quiet):
-                self.set(dict(zip(argnames, args)))
-                return self.exec(name)
+            if quiet:
+                with self.quiet():
+                    return call(args)
+            return call(args)
 
-        func.__name__ = name
-        func.__doc__ = f"Calls the {spec} lvp function"
-        if bind:
-            setattr(self, name, func)
-        return func
+        return _bind_function(self, name, spec, func, bind)
 
     def interact(self):
         """
@@ -251,6 +453,7 @@ class LVP:
         is_quiet = self._quiet
         if not is_quiet:
             self._send(b"quiet_connect\n")
+            self.log(b">>> quiet_connect\n")
         yield self
         self._quiet = is_quiet
         if not is_quiet:
@@ -269,21 +472,36 @@ class LVP:
         self._quiet = is_quiet
         if not is_quiet:
             self._send(b"quiet_connect\n")
+            self.log(b">>> quiet_connect\n")
+
+
+@lru_cache(maxsize=1)
+def _cached_comports(ttl_bucket):
+    return tuple(comports())
 
-    @contextmanager
-    def _maybe_quiet(self, flag):
-        if flag:
-            with self.quiet() as conn:
-                yield conn
-        else:
-            yield self
+
+def list_ports():
+    """
+    Return the available serial ports.
+
+    Enumerating ports is slow, hence the result is cached for PORT_CACHE_TTL
+    seconds. Call invalidate_port_cache() to force a new scan.
+    """
+    return _cached_comports(int(time.time() // PORT_CACHE_TTL))
+
+
+def invalidate_port_cache():
+    """
+    Discard the list of serial ports cached by list_ports().
+    """
+    _cached_comports.cache_clear()
 
 
 def default_device():
     """
     Returns the single serial device available or raises a ValueError.
     """
-    lst = comports()
+    lst = list_ports()
     if len(lst) == 1:
         return lst[0].device
     elif len(lst) == 0:
@@ -305,27 +523,73 @@ def default_logger(device, path=None, prepend_id=False, path_with_id=False):
     The default logger is print.
     """
 
+    # The log file is kept open between messages and only reopened when the
+    # path changes, i.e., every minute if path is not given. log.close()
+    # closes it; it is reopened if more messages arrive afterwards.
+    lock = Lock()
+    last_minute = None
+    fd = None
+
     def log(msg):
-        if path is None:
-            now = datetime.now()
-            ext = f"-{device.id}.log" if path_with_id else ".log"
-            path_ = now.strftime("%Y%m%d%H%M") + ext
-        else:
-            path_ = path
+        nonlocal last_minute, fd
 
+        now = time.time()
         if isinstance(msg, str):
             msg = msg.encode("utf8")
-        with open(path_, "ba") as fd:
-            if prepend_id:
-                timestamp = datetime.now().isoformat().rpartition('.')[0]
-                prefix = '[%s] [%s]  ' % (device.id, timestamp)
-                prefix = prefix.encode('utf8')
-                msg = prefix_lines(prefix, msg)
+        if prepend_id:
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now))
+            prefix = '[%s] [%s]  ' % (device.id, timestamp)
+            prefix = prefix.encode('utf8')
+            msg = prefix_lines(prefix, msg)
+
+        with lock:
+            minute = int(now // 60)
+            if fd is None or (path is None and minute != last_minute):
+                if path is None:
+                    ext = f"-{device.id}.log" if path_with_id else ".log"
+                    path_ = time.strftime("%Y%m%d%H%M", time.localtime(now)) + ext
+                else:
+                    path_ = path
+                if fd is not None:
+                    fd.close()
+                fd = open(path_, "ba")
+                last_minute = minute
             fd.write(msg)
+            fd.flush()
+
+    def close():
+        nonlocal fd
+        with lock:
+            if fd is not None:
+                fd.close()
+                fd = None
 
+    log.close = close
     return log
 
 
+def echo_logger(log):
+    """
+    Wrap logger so messages are also written to stdout.
+    """
+
+    def echo(msg):
+        # sys.stdout is looked up on each call to respect redirections
+        stdout = getattr(sys.stdout, "buffer", None)
+        if stdout is None:
+            # Text only streams, e.g., in Jupyter notebooks or redirect_stdout
+            text = msg.decode("utf8", "replace") if isinstance(msg, bytes) else msg
+            print(text, end="")
+        else:
+            stdout.write(msg.encode("utf8") if isinstance(msg, str) else msg)
+            stdout.flush()
+        log(msg)
+
+    if hasattr(log, "close"):
+        echo.close = log.close
+    return echo
+
+
 def normalize_response(value: str) -> Value:
     """
     Try to coerce string value to integer or float.
@@ -333,21 +597,59 @@ def normalize_response(value: str) -> Value:
     Return string if it does not succeed.
     """
     value = value.strip()
-    try:
+    if INT_RE.fullmatch(value):
         return int(value)
-    except ValueError:
-        pass
-
-    try:
+    elif FLOAT_RE.fullmatch(value):
         return float(value)
-    except ValueError:
-        pass
-
     return value
 
 
+def _parse_get_response(name: str, out: bytes) -> Value:
+    """
+    Extract value from the raw response to a get() command.
+    """
+    # Fast path: well formed responses start with the expected prefix.
+    prefix = b"Parameter '" + name.encode("ascii") + b"': "
+    if out.startswith(prefix):
+        value = _scan_line(out, len(prefix))
+        if value:
+            return normalize_response(value.decode("ascii"))
+
+    text = out.decode("ascii")
+    m = _get_re_for(name).search(text)
+    if not m:
+        raise RuntimeError(f"bad response: {text!r}")
+    return normalize_response(m.group(1))
+
+
+def _check_set_response(name: str, out: bytes) -> None:
+    """
+    Raise a RuntimeError if out is not a valid response to a set() command.
+    """
+    # Fast path: well formed responses start with the expected prefix.
+    prefix = b"Parameter '" + name.encode("ascii") + b"' set to '"
+    if out.startswith(prefix) and _scan_line(out, len(prefix)).endswith(b"'"):
+        return
+
+    text = out.decode("ascii")
+    if not _set_re_for(name).search(text):
+        raise RuntimeError(f"bad response: {text!r}")
+
+
+def _scan_line(data: bytes, start: int) -> bytes:
+    """
+    Return data from start up to the first line break.
+    """
+    end = len(data)
+    for sep in b"\r\n":
+        idx = data.find(sep, start, end)
+        if idx != -1:
+            end = idx
+    return data[start:end]
+
+
 def prefix_lines(prefix: bytes, msg: bytes) -> bytes:
-    lines = [prefix + ln for ln in msg.splitlines(True)]
-    return b''.join(lines)
+    # Backslashes are the only special characters in a re.sub() template.
+    return LINE_START_RE.sub(prefix.replace(b"\\", b"\\\\"), msg)
 
 # lvp = LVP(functions=['print()', 'blink(n)'])
@@ -1,24 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
 from types import MappingProxyType
-from serial.tools.list_ports import comports
-from threading import Thread
 from typing import List
 
-from .lvp import LVP
+from .lvp import LVP, BaseLVP, _bind_function, _parse_spec, list_ports
 
 
-class LVPPool:
+class BaseLVPPool:
     """
-    Communicates with more than one arduino simultaneously.
+    Functionality shared by LVPPool and AsyncLVPPool that does not perform I/O.
     """
 
+    device_class = BaseLVP
+
     @classmethod
-    def all_devices(cls, exclude=(), kind=LVP, merge_log=True, **kwargs):
+    def all_devices(cls, exclude=(), kind=None, merge_log=True, **kwargs):
         """
         Create an LVP pool using all connections
         """
+        kind = kind or cls.device_class
         kwargs.setdefault('log_id', merge_log)
         kwargs.setdefault('log_path_with_id', not merge_log)
-        devices = [p.device for p in comports() if p.device not in exclude]
+        devices = [p.device for p in list_ports() if p.device not in exclude]
         return cls([kind(device, **kwargs) for device in devices])
 
     def __init__(self, devices):
@@ -31,29 +33,9 @@ class LVPPool:
         return len(self.devices)
 
     def __repr__(self):
-        return f"<LVPPool with {[d.id for d in self]}>"
-
-    def _parallel_map(
-        self, func, devices=None, args=(), kwargs=MappingProxyType({}), timeout=None
-    ):
-        devices = self if devices is None else list(devices)
-
-        results = [None] * len(devices)
-
-        def target(i, dev):
-            results[i] = func(dev, *args, **kwargs)
+        return f"<{type(self).__name__} with {[d.id for d in self]}>"
 
-        threads = [Thread(target=target, args=item) for item in enumerate(devices)]
-
-        for thread in threads:
-            thread.start()
-
-        for thread in threads:
-            thread.join(timeout=timeout)
-
-        return {dev.id: res for dev, res in zip(devices, results)}
-
-    def query(self, query) -> List[LVP]:
+    def query(self, query) -> List[BaseLVP]:
         """
         Filter devices using query.
 
@@ -61,7 +43,7 @@ class LVPPool:
         """
         if query == ...:
             return list(self.devices.values())
-        elif isinstance(query, LVP):
+        elif isinstance(query, BaseLVP):
             return self.query(query.id)
         elif isinstance(query, (list, tuple)):
             result = set()
@@ -72,6 +54,54 @@ class LVPPool:
             return [self.devices[query]]
         raise ValueError("invalid query")
 
+
+class LVPPool(BaseLVPPool):
+    """
+    Communicates with more than one arduino simultaneously.
+    """
+
+    device_class = LVP
+
+    @classmethod
+    def all_devices(cls, exclude=(), kind=None, merge_log=True, **kwargs):
+        """
+        Create an LVP pool using all connections
+        """
+        if not kwargs.get('thread_safe', True):
+            raise ValueError("pool devices must be thread safe")
+        return super().all_devices(exclude, kind, merge_log, **kwargs)
+
+    def __init__(self, devices):
+        devices = list(devices)
+        for dev in devices:
+            # Executor workers may use the same device from different threads
+            if not getattr(dev, "thread_safe", True):
+                raise ValueError(f"device is not thread safe: {dev!r}")
+        super().__init__(devices)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.devices)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _parallel_map(
+        self, func, devices=None, args=(), kwargs=MappingProxyType({}), timeout=None
+    ):
+        devices = self if devices is None else list(devices)
+        submit = self._executor.submit
+        futures = {dev.id: submit(func, dev, *args, **kwargs) for dev in devices}
+        return {dev_id: f.result(timeout=timeout) for dev_id, f in futures.items()}
+
+    def close(self):
+        """
+        Shutdown the worker threads and close all devices.
+        """
+        self._executor.shutdown()
+        for dev in self:
+            dev.close()
+
     def get(self, ref, *args, timeout=None):
         """
         Get set of values from all selected devices.
@@ -91,8 +121,8 @@ class LVPPool:
         """
         Declare function.
         """
+        name, _ = _parse_spec(spec)
         funcs = {dev.id: dev.declare(spec, bind=False) for dev in self}
-        name = spec.split("(")[0]
 
         def func(query, *args, **kwargs):
             def target(dev):
@@ -100,11 +130,7 @@ class LVPPool:
 
             return self._parallel_map(target, self.query(query))
 
-        func.__name__ = name
-        func.__doc__ = f"Calls the {spec} lvp function"
-        if bind:
-            setattr(self, name, func)
-        return func
+        return _bind_function(self, name, spec, func, bind)
 
     def exec(self, query, cmd):
         self._parallel_map(lambda d: d.exec(cmd), self.query(query))
@@ -113,5 +139,5 @@ class LVPPool:
         self._parallel_map(lambda d: d.exec(cmd), self.query(query))
 
 
-p = LVPPool.all_devices()
-print(list(p))
\ No newline at end of file
+# p = LVPPool.all_devices()
+# print(list(p))
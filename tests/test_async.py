@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+serial_asyncio = pytest.importorskip("serial_asyncio")
+
+from pylvp.async_lvp import AsyncLVP  # noqa: E402
+from pylvp.async_lvp_pool import AsyncLVPPool  # noqa: E402
+from test_batch import FakeSerial  # noqa: E402
+
+
+class FakeWriter:
+    """
+    Stream writer that forwards commands to a FakeSerial and feeds its
+    responses to the paired stream reader.
+    """
+
+    def __init__(self, device, reader):
+        self.device = FakeSerial(device)
+        self.reader = reader
+        self.closed = False
+
+    def write(self, msg):
+        self.device.write(msg)
+        self.reader.feed_data(bytes(self.device.buf))
+        self.device.buf.clear()
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+@pytest.fixture
+def writers(monkeypatch):
+    writers = {}
+
+    async def open_serial_connection(url, baudrate):
+        reader = asyncio.StreamReader()
+        writers[url] = FakeWriter(url, reader)
+        return reader, writers[url]
+
+    monkeypatch.setattr(
+        serial_asyncio, "open_serial_connection", open_serial_connection
+    )
+    return writers
+
+
+def make_dev(device, **kwargs):
+    return AsyncLVP(device, cooldown=0, log=lambda msg: None, **kwargs)
+
+
+def test_async_lvp(writers):
+    async def main():
+        dev = make_dev("/dev/fake0", functions=["blink(n)"])
+        await dev.set("a", 1)
+        assert await dev.get("a") == 1
+        await dev.set(a=2, b=2.5)
+        assert await dev.get("a", "b") == (2, 2.5)
+        assert await dev.blink(3) == "ran blink\n"
+        assert await dev.get("n") == 3
+
+        await dev.close()
+        assert writers["/dev/fake0"].closed
+
+    asyncio.run(main())
+
+
+def test_async_lvp_pool(writers):
+    async def main():
+        devs = [make_dev(f"/dev/fake{i}") for i in range(3)]
+        async with AsyncLVPPool(devs) as pool:
+            await pool.set(..., "x", 4)
+            assert await pool.get(..., "x") == {"fake0": 4, "fake1": 4, "fake2": 4}
+            pool.declare("blink(n)")
+            assert await pool.blink(["fake1"], 1) == {"fake1": "ran blink\n"}
+            assert await pool.get("fake1", "n") == {"fake1": 1}
+        assert all(writer.closed for writer in writers.values())
+
+    asyncio.run(main())
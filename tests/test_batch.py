@@ -0,0 +1,141 @@
+import re
+
+import pytest
+import serial
+
+from pylvp import lvp as lvp_module
+from pylvp.lvp import LVP
+
+
+class FakeSerial:
+    """
+    Emulates an arduino running the LVP protocol.
+
+    mode controls how compound lines such as "get(a);get(b)" are handled:
+
+    * "full": every command is executed.
+    * "first": only the first command is executed, the rest is ignored.
+    * "literal": the line is parsed as a single command, hence set(a,1);set(b,2)
+      assigns "1);set(b,2" to a.
+    * "none": compound lines are rejected with a parse error.
+
+    Like Serial.print(float) on arduino, floats are echoed with 2 decimals.
+    """
+
+    def __init__(self, device, baudrate=9600, mode="full"):
+        self.mode = mode
+        self.buf = bytearray()
+        self.vars = {}
+        self.timeout = None
+        self.writes = []
+
+    def write(self, msg):
+        self.writes.append(msg)
+        line = msg.strip()
+        if b";" not in line or self.mode == "literal":
+            cmds = [line]
+        elif self.mode == "none":
+            cmds = []
+            self.buf += b"parse error\r\n"
+        elif self.mode == "first":
+            cmds = line.split(b";")[:1]
+        else:
+            cmds = line.split(b";")
+
+        for cmd in cmds:
+            self._run(cmd)
+
+    def _run(self, cmd):
+        if cmd == b"manual_connect":
+            self.buf += lvp_module.ACK_MSG
+        elif m := re.fullmatch(rb"get\((\w+)\)", cmd):
+            if m[1] in self.vars:
+                self.buf += b"Parameter '%s': %s\r\n" % (m[1], self.vars[m[1]])
+            else:
+                self.buf += b"Unknown parameter '%s'\r\n" % m[1]
+        elif m := re.fullmatch(rb"set\((\w+),(.*)\)", cmd):
+            value = m[2]
+            if re.fullmatch(rb"-?\d*\.\d+", value):
+                value = b"%.2f" % float(value)
+            self.vars[m[1]] = value
+            self.buf += b"Parameter '%s' set to '%s'\r\n" % (m[1], value)
+        else:
+            self.buf += b"ran " + cmd + b"\r\n"
+
+    def _take(self, size):
+        out = bytes(self.buf[:size])
+        del self.buf[:size]
+        return out
+
+    def readline(self):
+        return self.read_until(b"\n")
+
+    def read_until(self, until):
+        idx = self.buf.find(until)
+        if idx == -1:
+            assert self.timeout is not None, "read would block forever"
+            return self._take(len(self.buf))
+        return self._take(idx + len(until))
+
+
+@pytest.fixture
+def make_lvp(monkeypatch):
+    def make(mode):
+        fake = lambda *args, **kwargs: FakeSerial(*args, mode=mode)
+        monkeypatch.setattr(serial, "Serial", fake)
+        dev = LVP("/dev/fake", cooldown=0, log=lambda msg: None)
+        dev.init()
+        return dev
+
+    return make
+
+
+def compound_writes(dev):
+    return [msg for msg in dev._serial.writes if b";" in msg]
+
+
+def test_batch_with_full_support(make_lvp):
+    dev = make_lvp("full")
+    dev.set(a=1, b=2.5)
+    assert dev.get("a", "b") == (1, 2.5)
+    assert dev._batch_ok
+    assert compound_writes(dev) == [b"set(a,1);set(b,2.5)\n", b"get(a);get(b)\n"]
+
+
+@pytest.mark.parametrize("mode", ["first", "literal", "none"])
+def test_batch_falls_back_without_support(make_lvp, mode):
+    dev = make_lvp(mode)
+    dev.set(a=1, b=2)
+    assert dev.get("a", "b") == (1, 2)
+    assert not dev._batch_ok
+
+    # After the first rejection, requests go straight to the per-name path
+    assert len(compound_writes(dev)) == 1
+    dev.set(a=3, b=4)
+    assert dev.get("a", "b") == (3, 4)
+    assert len(compound_writes(dev)) == 1
+
+
+def test_batch_accepts_reformatted_echo(make_lvp):
+    dev = make_lvp("full")
+    dev.set(a=3.14159, b=1)
+    assert dev.get("a", "b") == (3.14, 1)
+    assert dev._batch_ok
+    assert dev._serial.writes.count(b"set(a,3.14159)\n") == 0
+
+
+def test_batch_bad_name_does_not_disable_batching(make_lvp):
+    dev = make_lvp("full")
+    dev.set(a=1, b=2)
+    with pytest.raises(RuntimeError):
+        dev.get("a", "missing")
+    assert dev._batch_ok
+    assert dev.get("a", "b") == (1, 2)
+
+
+def test_batch_survives_non_ascii_noise(make_lvp):
+    dev = make_lvp("full")
+    dev.set(a=1, b=2)
+    dev._serial.buf += b"\xff\xfe noise\r\n"
+    assert dev.get("a", "b") == (1, 2)
+    assert not dev._serial.buf